@@ -1,15 +1,100 @@
 #!/usr/bin/env python3
 """runpod - Unified RunPod GPU management tool"""
-import runpod
 import os
 import sys
 import time
-import argparse
+import math
+import random
+import itertools
+import re
+import io
+import threading
+import functools
+from collections import namedtuple
 import subprocess
 
 VERSION = "2.0"
 PROGRAM_NAME = os.path.basename(sys.argv[0])
 CONFIG_FILE = os.path.expanduser("~/.runpod-config")
+POD_FILE = os.path.expanduser("~/.runpod-pod")
+READY_TIMES_KEPT = 20
+TERMINATE_POLL_MAX = 2.0
+WRITE_BUFFER_SIZE = io.DEFAULT_BUFFER_SIZE * 8
+
+BAR_WIDTH = 40
+BAR_CHARS = tuple('=' * i + '-' * (BAR_WIDTH - i) for i in range(BAR_WIDTH + 1))
+_FULL_BAR = BAR_CHARS[BAR_WIDTH]
+RENDER_INTERVAL = 0.1
+
+API_URL = os.environ.get("RUNPOD_API_BASE_URL", "https://api.runpod.io") + "/graphql"
+POD_FIELDS = "id name imageName runtime { ports { ip privatePort publicPort } }"
+PODS_TTL = 5.0
+
+# From <sys/timerfd.h>, for Pythons without os.timerfd_create (< 3.13)
+TFD_TIMER_ABSTIME = 1
+TFD_CLOEXEC = 0o2000000
+
+# KEY="quoted value" or KEY=bare value (rest of the line, trailing blanks
+# dropped), optionally indented; comment lines never match a key
+_CFG_RE = re.compile(rb'(?m)^[ \t]*([A-Z_][A-Z0-9_]*)=(?:"([^"\r\n]*)"|([^\r\n]*?))[ \t]*\r?$')
+
+def _atomic_write(path, data, mode=0o600, fsync=False):
+    """Write bytes to path through a temp file and os.replace
+    
+    Symlinks are followed so the target file is replaced, not the link.
+    The temp name includes the pid so concurrent invocations don't collide.
+    With fsync=True the data and the rename are flushed to disk before
+    returning.
+    """
+    path = os.path.realpath(path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        with open(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+        
+        if fsync:
+            dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def _parse_config():
+    """Parse KEY="value" lines from the config file"""
+    with open(CONFIG_FILE, 'rb') as f:
+        blob = f.read()
+    return {k.decode(): (q or u).decode() for k, q, u in _CFG_RE.findall(blob)}
+
+def _load_config_cached():
+    """Parse the config file, reusing an earlier result while it is unchanged
+    
+    Results are memoized for the life of the process, keyed by the file's
+    (st_mtime_ns, st_size). Any write to the config file changes the stamp
+    and forces a reparse.
+    """
+    st = os.stat(CONFIG_FILE)
+    return dict(_config_for_stamp(CONFIG_FILE, (st.st_mtime_ns, st.st_size)))
+
+@functools.lru_cache(maxsize=1)
+def _config_for_stamp(path, stamp):
+    """Parsed config for a given file stamp"""
+    return _parse_config()
+
+def write_config(config):
+    """Serialize a config dict to the config file in one atomic write"""
+    blob = ''.join(f'{key}="{value}"\n' for key, value in config.items())
+    _atomic_write(CONFIG_FILE, blob.encode())
 
 def load_config():
     """Load configuration from file"""
@@ -17,21 +102,593 @@ def load_config():
         print(f"Error: No configuration found. Run '{PROGRAM_NAME} setup' first")
         sys.exit(1)
     
-    config = {}
-    with open(CONFIG_FILE) as f:
-        for line in f:
-            if '=' in line and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                config[key] = value.strip('"')
+    config = _load_config_cached()
     
     # Defaults
     if 'RUNPOD_AUTO_SSH' not in config:
         config['RUNPOD_AUTO_SSH'] = 'true'
+    config.setdefault('RUNPOD_POLL_BASE', '1.3')
+    config.setdefault('RUNPOD_POLL_MIN', '0.2')
+    config.setdefault('RUNPOD_POLL_MAX', '8.0')
+    
+    # Catch bad poll settings here, not after cmd_up has created a billed pod
+    try:
+        poll_settings(config)
+    except ValueError as e:
+        print(f"Error: Invalid setting in {CONFIG_FILE}: {e}")
+        sys.exit(1)
     
     return config
 
-def setup_ssh_access(pod_id):
-    """Configure SSH access for a pod using Include pattern"""
+_BLANK_RUN_RE = re.compile(rb'\n{3,}')
+
+@functools.lru_cache(maxsize=None)
+def _config_key_re(key):
+    """Compiled pattern matching every KEY= line in config bytes"""
+    return re.compile(rb'(?m)^\s*' + re.escape(key.encode()) + rb'=.*\n?')
+
+def _strip_config_key(blob, key):
+    """Drop every KEY= line (and blank lines left behind) from config bytes
+    
+    Returns (blob, count) with count the number of lines removed.
+    """
+    blob, count = _config_key_re(key).subn(b'', blob)
+    if count:
+        blob = _BLANK_RUN_RE.sub(b'\n\n', blob)
+    return blob, count
+
+def save_config_value(key, value):
+    """Set key in the config file, replacing an existing entry"""
+    with open(CONFIG_FILE, 'rb') as f:
+        blob, _ = _strip_config_key(f.read(), key)
+    
+    if blob and not blob.endswith(b'\n'):
+        blob += b'\n'
+    blob += f'{key}="{value}"\n'.encode()
+    
+    _atomic_write(CONFIG_FILE, blob)
+
+def remove_config_value(key):
+    """Remove key from the config file (no write if it isn't there)"""
+    with open(CONFIG_FILE, 'rb') as f:
+        blob, count = _strip_config_key(f.read(), key)
+    
+    if count:
+        _atomic_write(CONFIG_FILE, blob)
+
+def _save_pod_id(pod_id):
+    """Durably record the current pod ID in POD_FILE"""
+    _atomic_write(POD_FILE, pod_id.encode(), fsync=True)
+
+def _load_pod_id(config):
+    """Current pod ID from POD_FILE, falling back to a legacy config entry"""
+    try:
+        with open(POD_FILE) as f:
+            pod_id = f.read().strip()
+        if pod_id:
+            return pod_id
+    except FileNotFoundError:
+        pass
+    return config.get('RUNPOD_POD_ID')
+
+def _clear_pod_id(config):
+    """Forget the current pod ID"""
+    try:
+        os.remove(POD_FILE)
+    except FileNotFoundError:
+        pass
+    if 'RUNPOD_POD_ID' in config:
+        remove_config_value('RUNPOD_POD_ID')
+
+def poll_settings(config):
+    """Backoff parameters for poll_with_backoff from config
+    
+    Raises ValueError naming the offending key if a value is not a finite
+    number or the three don't form a sane backoff (MIN > 0, BASE >= 1,
+    MAX >= MIN).
+    """
+    settings = {}
+    for name, key in (('base', 'RUNPOD_POLL_BASE'), ('t_min', 'RUNPOD_POLL_MIN'), ('t_max', 'RUNPOD_POLL_MAX')):
+        try:
+            settings[name] = float(config[key])
+        except ValueError:
+            raise ValueError(f"{key}={config[key]!r} is not a number")
+        if not math.isfinite(settings[name]):
+            raise ValueError(f"{key}={config[key]!r} is not a finite number")
+    
+    if not settings['t_min'] > 0:
+        raise ValueError("RUNPOD_POLL_MIN must be greater than 0")
+    if not settings['base'] >= 1:
+        raise ValueError("RUNPOD_POLL_BASE must be at least 1")
+    if not settings['t_max'] >= settings['t_min']:
+        raise ValueError("RUNPOD_POLL_MAX must not be less than RUNPOD_POLL_MIN")
+    return settings
+
+@functools.lru_cache(maxsize=None)
+def _itimerspec_types():
+    """ctypes timespec/itimerspec, for timerfd_settime on Pythons before 3.13"""
+    import ctypes
+    
+    class Timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+    
+    class Itimerspec(ctypes.Structure):
+        _fields_ = [('it_interval', Timespec), ('it_value', Timespec)]
+    
+    return Timespec, Itimerspec
+
+_TIMERFD = None
+
+def _timerfd():
+    """Lazily create a CLOCK_MONOTONIC timerfd, or return None if unsupported"""
+    global _TIMERFD
+    if _TIMERFD is not None:
+        return _TIMERFD or None
+    
+    _TIMERFD = False
+    if not sys.platform.startswith('linux'):
+        return None
+    
+    try:
+        if hasattr(os, 'timerfd_create'):
+            _TIMERFD = (os.timerfd_create(time.CLOCK_MONOTONIC, flags=os.TFD_CLOEXEC), None)
+        else:
+            import ctypes
+            libc = ctypes.CDLL("libc.so.6", use_errno=True)
+            fd = libc.timerfd_create(time.CLOCK_MONOTONIC, TFD_CLOEXEC)
+            if fd >= 0:
+                _TIMERFD = (fd, libc)
+    except (OSError, AttributeError):
+        pass
+    
+    return _TIMERFD or None
+
+def _sleep_until(deadline):
+    """Sleep until time.monotonic() reaches deadline
+    
+    On Linux this arms a timerfd with TFD_TIMER_ABSTIME against
+    CLOCK_MONOTONIC (the clock behind time.monotonic()), which wakes at the
+    deadline itself rather than after a relative sleep that drifts under
+    load. Elsewhere it falls back to time.sleep().
+    """
+    timer = _timerfd()
+    if timer and deadline > time.monotonic():
+        fd, libc = timer
+        try:
+            if libc is None:
+                os.timerfd_settime(fd, flags=os.TFD_TIMER_ABSTIME, initial=deadline)
+            else:
+                import ctypes
+                Timespec, Itimerspec = _itimerspec_types()
+                sec = int(deadline)
+                spec = Itimerspec(Timespec(0, 0), Timespec(sec, int((deadline - sec) * 1e9)))
+                if libc.timerfd_settime(fd, TFD_TIMER_ABSTIME, ctypes.byref(spec), None) != 0:
+                    raise OSError(ctypes.get_errno(), "timerfd_settime failed")
+            os.read(fd, 8)
+            return
+        except OSError:
+            pass
+    
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+
+def _backoff_intervals(base, t_min, t_max):
+    """Truncated exponential backoff delays, without jitter"""
+    # Stop exponentiating once capped; base ** n would eventually overflow
+    growth = itertools.takewhile(lambda d: d < t_max, (t_min * base ** n for n in itertools.count()))
+    return itertools.chain(growth, itertools.repeat(t_max))
+
+def backoff_delays(base=1.3, t_min=0.2, t_max=8.0):
+    """Truncated exponential backoff delays with +/-10% jitter"""
+    return (d + random.uniform(-0.1, 0.1) * d for d in _backoff_intervals(base, t_min, t_max))
+
+def ready_time_samples(config):
+    """Previously observed pod start times (seconds) from config"""
+    samples = []
+    for value in config.get('RUNPOD_READY_TIMES', '').split(','):
+        try:
+            samples.append(float(value))
+        except ValueError:
+            pass
+    return samples
+
+def record_ready_time(config, elapsed):
+    """Append a pod start time to the RUNPOD_READY_TIMES ring buffer"""
+    samples = ready_time_samples(config)[-(READY_TIMES_KEPT - 1):] + [elapsed]
+    save_config_value('RUNPOD_READY_TIMES', ','.join(f"{t:.1f}" for t in samples))
+
+def poll_schedule(samples, k=15):
+    """Poll times minimizing expected detection delay for the observed start times
+    
+    p(t) is a Gaussian KDE over log(samples), since start times are bimodal
+    (cached vs cold image pulls). Poll times follow the recurrence
+    L_i = L_{i-1} + (F(L_{i-1}) - F(L_{i-2})) / p(L_{i-1}), bisecting on L_1
+    so that k polls span up to the 99th percentile U. Returns L_1..L_k in
+    seconds since start.
+    """
+    logs = [math.log(max(t, 0.1)) for t in samples]
+    n = len(logs)
+    ordered = sorted(logs)
+    mean = sum(logs) / n
+    sd = math.sqrt(sum((u - mean) ** 2 for u in logs) / n)
+    iqr = ordered[(3 * n) // 4] - ordered[n // 4]
+    spread = min(sd, iqr / 1.34) if iqr > 0 else sd
+    # In log space a fixed floor is relative: about +/-20% of the start time
+    h = max(0.9 * spread * n ** -0.2, 0.2)
+    
+    def pdf(t):
+        u = math.log(t)
+        return sum(math.exp(-0.5 * ((u - x) / h) ** 2) for x in logs) / (n * h * math.sqrt(2 * math.pi) * t)
+    
+    def cdf(t):
+        if t <= 0:
+            return 0.0
+        u = math.log(t)
+        return sum(0.5 * (1 + math.erf((u - x) / (h * math.sqrt(2)))) for x in logs) / n
+    
+    lower = math.exp(ordered[0] - 2 * h)
+    upper = math.exp(ordered[min(n - 1, math.ceil(0.99 * n) - 1)] + h)
+    
+    def build(l1):
+        points = [0.0, l1]
+        while len(points) <= k and points[-1] < upper:
+            density = pdf(points[-1])
+            gap = (cdf(points[-1]) - cdf(points[-2])) / density if density > 0 else upper
+            points.append(points[-1] + gap)
+        return points[1:]
+    
+    lo, hi = lower, upper
+    for _ in range(40):
+        l1 = (lo + hi) / 2
+        if build(l1)[-1] < upper:
+            lo = l1
+        else:
+            hi = l1
+    
+    return [min(t, upper) for t in build(hi)]
+
+def _schedule_delays(schedule, t_min, t_max):
+    """Delays between schedule points, with every gap within [t_min, t_max]"""
+    delays = []
+    previous = 0.0
+    for t in schedule:
+        span = t - previous
+        # Merge points too close to the last poll; split spans wider than t_max
+        if span < t_min:
+            continue
+        steps = math.ceil(span / t_max)
+        delays += [span / steps] * steps
+        previous = t
+    return delays
+
+def adaptive_delays(samples, base=1.3, t_min=0.2, t_max=8.0, k=15):
+    """Yield delays following poll_schedule, then poll every t_max
+    
+    k is lowered until the schedule costs no more polls than plain backoff
+    would make over the same stretch.
+    """
+    if len(samples) < 3:
+        yield from backoff_delays(base, t_min, t_max)
+        return
+    
+    schedule = poll_schedule(samples, k)
+    elapsed = 0.0
+    budget = 0
+    for delay in _backoff_intervals(base, t_min, t_max):
+        elapsed += delay
+        if elapsed > schedule[-1]:
+            break
+        budget += 1
+    
+    delays = _schedule_delays(schedule, t_min, t_max)
+    while len(delays) > max(budget, 1) and k > 1:
+        k -= 1
+        delays = _schedule_delays(poll_schedule(samples, k), t_min, t_max)
+    
+    yield from delays
+    yield from backoff_delays(base, t_max, t_max)
+
+def poll_with_backoff(check_fn, max_wait, base=1.3, t_min=0.2, t_max=8.0, delays=None):
+    """Call check_fn until it returns a truthy value or max_wait seconds pass
+    
+    Sleeps between calls grow exponentially from t_min to t_max with +/-10%
+    jitter, unless an explicit delays iterator is given. Returns the truthy
+    result, or None on timeout.
+    """
+    if delays is None:
+        delays = backoff_delays(base, t_min, t_max)
+    start = time.monotonic()
+    deadline = start
+    
+    for delay in delays:
+        now = time.monotonic()
+        if now - start >= max_wait:
+            return None
+        
+        # Deadlines are absolute so sleep overshoot doesn't accumulate; a
+        # slow API call only pushes the next poll back to "now"
+        deadline = max(deadline + delay, now)
+        _sleep_until(min(deadline, start + max_wait))
+        
+        result = check_fn()
+        if result:
+            return result
+
+def draw_progress(label, elapsed, max_wait, last=None):
+    """Redraw a single-line progress bar in place (caller flushes stdout)
+    
+    Returns the (filled, remaining) pair shown; nothing is written when it
+    matches last, the pair returned by the previous call.
+    """
+    progress = min(elapsed / max_wait, 1.0)
+    filled = int(BAR_WIDTH * progress)
+    remaining = max(int(max_wait - elapsed), 0)
+    if (filled, remaining) == last:
+        return last
+    
+    line = f"\r{label} [{BAR_CHARS[filled]}] {remaining}s "
+    out = getattr(sys.stdout, 'buffer', None)
+    if out is None:
+        sys.stdout.write(line)
+    else:
+        out.write(line.encode())
+    return filled, remaining
+
+def _scan_host_key(host, port, timeout=5):
+    """Fetch the server's host key with paramiko as known_hosts lines (None to fall back to ssh-keyscan)"""
+    try:
+        import paramiko
+    except ImportError:
+        return None
+    
+    import socket
+    
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError:
+        return []
+    
+    transport = None
+    try:
+        transport = paramiko.Transport(sock)
+        transport.get_security_options().key_types = ('ssh-ed25519', 'rsa-sha2-512', 'rsa-sha2-256')
+        transport.start_client(timeout=timeout)
+        key = transport.get_remote_server_key()
+        return [f"[{host}]:{port} {key.get_name()} {key.get_base64()}\n"]
+    except (paramiko.SSHException, OSError, EOFError, ValueError):
+        # ValueError: key type unknown to this paramiko version
+        return None
+    finally:
+        if transport is None:
+            sock.close()
+        else:
+            transport.close()
+
+def _strip_known_hosts(blob, names):
+    """Drop known_hosts lines naming any of names, like 'ssh-keygen -R'
+    
+    Matches plain comma-separated host lists and hashed |1|salt|hash
+    entries. Marker (@cert-authority, @revoked) and comment lines are kept.
+    Returns (kept, removed) as bytes.
+    """
+    import base64
+    import hmac
+    
+    names = [name.encode() for name in names]
+    kept = bytearray()
+    removed = bytearray()
+    
+    for line in blob.splitlines(keepends=True):
+        hosts = line.split(None, 1)[0] if line.strip() else b'#'
+        if hosts.startswith((b'#', b'@')):
+            kept += line
+            continue
+        
+        for entry in hosts.split(b','):
+            if entry.startswith(b'|1|'):
+                salt, _, digest = entry[3:].partition(b'|')
+                try:
+                    salt, digest = base64.b64decode(salt), base64.b64decode(digest)
+                except ValueError:
+                    continue
+                if any(hmac.compare_digest(hmac.digest(salt, name, 'sha1'), digest) for name in names):
+                    break
+            elif entry in names:
+                break
+        else:
+            kept += line
+            continue
+        removed += line
+    
+    return bytes(kept), bytes(removed)
+
+async def _refresh_hostkeys(host, port, known_hosts):
+    """Drop stale known_hosts entries while scanning the new key; returns (kept, removed, new_keys)"""
+    import asyncio
+    
+    def remove_old():
+        try:
+            with open(known_hosts, 'rb') as f:
+                blob = f.read()
+        except FileNotFoundError:
+            blob = b''
+        return _strip_known_hosts(blob, (host, f'[{host}]:{port}'))
+    
+    async def scan():
+        lines = await asyncio.get_running_loop().run_in_executor(None, _scan_host_key, host, port)
+        if lines is not None:
+            return ''.join(lines).encode()
+        
+        # Rewrite each line's host field to [host]:port
+        bare = f"{host} ".encode()
+        bracketed = f"[{host}]:{port} ".encode()
+        new_keys = bytearray()
+        
+        proc = await asyncio.create_subprocess_exec(
+            'ssh-keyscan', '-p', str(port), '-t', 'ed25519,rsa', host,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        async for line in proc.stdout:
+            if line.startswith(bare):
+                line = bracketed + line[len(bare):]
+            new_keys += line
+        
+        if await proc.wait() != 0:
+            return b''
+        return bytes(new_keys)
+    
+    loop = asyncio.get_running_loop()
+    (kept, removed), new_keys = await asyncio.gather(loop.run_in_executor(None, remove_old), scan())
+    return kept, removed, new_keys
+
+def _render_bar(state):
+    """Repaint the progress bar every RENDER_INTERVAL until state['done'] is set
+    
+    Repaints are written unflushed and pushed out once per tick, and only
+    when the bar or the countdown changed, so the terminal sees at most
+    one write() per visible change.
+    """
+    out = getattr(sys.stdout, 'buffer', sys.stdout)
+    shown = None
+    while not state['done'].is_set():
+        drawn = draw_progress(state['label'], time.monotonic() - state['start'], state['max_wait'], shown)
+        if drawn != shown:
+            out.flush()
+            shown = drawn
+        state['done'].wait(RENDER_INTERVAL)
+
+def poll_with_progress(label, check_fn, max_wait, **poll_args):
+    """poll_with_backoff with a progress bar drawn from a background thread
+    
+    Rendering stays off the polling path, so a slow terminal or pipe never
+    delays the next API call.
+    """
+    # The bar bypasses the text layer, so push out anything printed so far
+    sys.stdout.flush()
+    
+    state = {
+        'label': label,
+        'start': time.monotonic(),
+        'max_wait': max_wait,
+        'done': threading.Event(),
+    }
+    renderer = threading.Thread(target=_render_bar, args=(state,), daemon=True)
+    renderer.start()
+    
+    try:
+        return poll_with_backoff(check_fn, max_wait, **poll_args)
+    finally:
+        state['done'].set()
+        renderer.join()
+
+class _SessionRequests:
+    """Stand-in for the requests module that POSTs through a shared Session"""
+    
+    def __init__(self, session):
+        self._session = session
+    
+    def __getattr__(self, name):
+        import requests
+        return getattr(requests, name)
+    
+    def post(self, *args, **kwargs):
+        return self._session.post(*args, **kwargs)
+    
+    def get(self, *args, **kwargs):
+        return self._session.get(*args, **kwargs)
+
+def _json_response_hook(response, *args, **kwargs):
+    """Make response.json() parse the body once, with orjson when installed
+    
+    The SDK calls response.json() up to three times per GraphQL reply.
+    """
+    try:
+        import orjson
+        loads = orjson.loads
+    except ImportError:
+        import json
+        loads = json.loads
+    
+    parsed = []
+    
+    def json_once(**kwargs):
+        if not parsed:
+            parsed.append(loads(response.content))
+        return parsed[0]
+    
+    response.json = json_once
+    return response
+
+@functools.lru_cache(maxsize=None)
+def _api_session():
+    """Keep-alive HTTPS session shared by every API call in this process"""
+    import requests
+    
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+    session.hooks['response'].append(_json_response_hook)
+    return session
+
+def _graphql(query, api_key, session=None):
+    """POST a GraphQL query over the shared session and return its data"""
+    session = session or _api_session()
+    response = session.post(
+        API_URL,
+        headers={
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {api_key}'
+        },
+        json={'query': query},
+        timeout=30
+    )
+    
+    payload = response.json()
+    if payload.get('errors'):
+        raise RuntimeError(payload['errors'][0]['message'])
+    return payload['data']
+
+def _get_pod_cached(pod_id, api_key, session=None):
+    """Fetch one pod over the cached keep-alive session (None if not found)"""
+    query = f'query {{ pod(input: {{podId: "{pod_id}"}}) {{ {POD_FIELDS} }} }}'
+    return _graphql(query, api_key, session)['pod']
+
+_pods_cache = None
+
+def _get_pods_cached(max_age=PODS_TTL):
+    """runpod.get_pods(), reused for max_age seconds within this process
+    
+    Call _init_runpod first. The list is kept as (monotonic time, pods) in
+    _pods_cache, so status and target resolution share one request.
+    """
+    import runpod
+    global _pods_cache
+    
+    now = time.monotonic()
+    if _pods_cache is None or now - _pods_cache[0] > max_age:
+        _pods_cache = (now, runpod.get_pods() or [])
+    return _pods_cache[1]
+
+def _init_runpod(config):
+    """Import the runpod SDK, set the API key and route its requests through _api_session"""
+    import runpod
+    
+    runpod.api_key = config['RUNPOD_API_KEY']
+    
+    try:
+        from runpod.api import graphql
+    except ImportError:
+        graphql = None
+    if graphql is not None and not isinstance(getattr(graphql, 'requests', None), (type(None), _SessionRequests)):
+        graphql.requests = _SessionRequests(_api_session())
+    
+    return runpod
+
+def setup_ssh_access(pod_id, pod=None):
+    """Configure SSH access for a pod using Include pattern (pod: already-fetched pod dict)"""
+    import asyncio
+    import runpod
+    
     ssh_dir = os.path.expanduser("~/.ssh")
     runpod_dir = os.path.join(ssh_dir, "runpod.d")
     current_conf = os.path.join(runpod_dir, "current.conf")
@@ -42,7 +699,8 @@ def setup_ssh_access(pod_id):
     os.makedirs(ssh_dir, exist_ok=True)
     
     try:
-        pod = runpod.get_pod(pod_id)
+        if pod is None:
+            pod = _get_pod_cached(pod_id, runpod.api_key)
         
         if not pod:
             print(f"Pod {pod_id} not found")
@@ -68,57 +726,65 @@ def setup_ssh_access(pod_id):
             return False
         
         # Write current.conf
-        with open(current_conf, 'w') as f:
-            f.write(f"HostName {ssh_host}\n")
-            f.write(f"Port {ssh_port}\n")
-        os.chmod(current_conf, 0o600)
+        _atomic_write(current_conf, f"HostName {ssh_host}\nPort {ssh_port}\n".encode())
         
         # Ensure main config has Include and Host runpod entry
         include_line = f"Include {runpod_dir}/*.conf\n"
-        host_block = "\nHost runpod\n  User root\n  StrictHostKeyChecking no\n  UserKnownHostsFile /dev/null\n"
+        # Multiplex the back-to-back ssh/scp calls in check_and_run_setup and
+        # cmd_install over one connection; %h:%p keeps pods on separate sockets
+        host_block = (
+            "\nHost runpod\n  User root\n  StrictHostKeyChecking no\n  UserKnownHostsFile /dev/null\n"
+            "  ControlMaster auto\n"
+            f"  ControlPath {runpod_dir}/cm-%r@%h:%p\n"
+            "  ControlPersist 600\n"
+        )
         
-        config_needs_update = True
-        if os.path.exists(ssh_config):
+        # Read existing config (empty if missing)
+        try:
             with open(ssh_config, 'r') as f:
-                content = f.read()
-                if include_line.strip() in content and "Host runpod" in content:
-                    config_needs_update = False
-        
-        if config_needs_update:
+                existing_content = f.read()
+                mode = os.fstat(f.fileno()).st_mode & 0o777
+        except FileNotFoundError:
             existing_content = ""
-            if os.path.exists(ssh_config):
-                with open(ssh_config, 'r') as f:
-                    existing_content = f.read()
-            
-            with open(ssh_config, 'w') as f:
-                if include_line.strip() not in existing_content:
-                    f.write(include_line)
-                
-                f.write(existing_content)
-                
-                if "Host runpod" not in existing_content:
-                    f.write(host_block)
+            mode = 0o600
         
-        # Refresh known_hosts
-        subprocess.run(['ssh-keygen', '-R', ssh_host], 
-                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        subprocess.run(['ssh-keygen', '-R', f'[{ssh_host}]:{ssh_port}'], 
-                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        result = subprocess.run(
-            ['ssh-keyscan', '-p', str(ssh_port), '-t', 'ed25519,rsa', ssh_host],
-            capture_output=True, text=True
+        lines = frozenset(line.strip() for line in existing_content.splitlines())
+        has_include = include_line.strip() in lines
+        has_host = any(
+            words[0].lower() == 'host' and 'runpod' in words[1:]
+            for words in (line.split() for line in lines if line)
         )
         
-        if result.returncode == 0 and result.stdout:
-            new_keys = result.stdout.replace(f"{ssh_host} ", f"[{ssh_host}]:{ssh_port} ")
+        if not (has_include and has_host):
+            new_content = bytearray()
+            if not has_include:
+                new_content += include_line.encode()
+            
+            new_content += existing_content.encode()
             
-            with open(known_hosts, 'a') as f:
-                f.write(new_keys)
-            os.chmod(known_hosts, 0o600)
+            if not has_host:
+                new_content += host_block.encode()
             
+            _atomic_write(ssh_config, new_content, mode)
+        
+        # Refresh known_hosts
+        kept, removed, new_keys = asyncio.run(_refresh_hostkeys(ssh_host, ssh_port, known_hosts))
+        
+        # Re-runs against a living pod scan the keys already on file; leave
+        # known_hosts untouched when the stale lines are exactly the new ones
+        unchanged = bool(new_keys) and sorted(removed.splitlines()) == sorted(new_keys.splitlines())
+        
+        if (removed or new_keys) and not unchanged:
+            if kept and not kept.endswith(b'\n'):
+                kept += b'\n'
+            _atomic_write(known_hosts, kept + new_keys)
+        
+        if new_keys:
             print(f"Updated {current_conf}")
-            print(f"Refreshed host key for [{ssh_host}]:{ssh_port}")
+            if unchanged:
+                print(f"Host key for [{ssh_host}]:{ssh_port} unchanged")
+            else:
+                print(f"Refreshed host key for [{ssh_host}]:{ssh_port}")
         
         print("You can now connect with: ssh runpod")
         return True
@@ -130,16 +796,26 @@ def setup_ssh_access(pod_id):
 def cmd_ssh():
     """Configure SSH access"""
     config = load_config()
+    pod_id = _load_pod_id(config)
     
-    if 'RUNPOD_POD_ID' not in config:
+    if not pod_id:
         print(f"No active pod found. Run '{PROGRAM_NAME} up' first")
         sys.exit(1)
     
-    runpod.api_key = config['RUNPOD_API_KEY']
-    pod_id = config['RUNPOD_POD_ID']
+    _init_runpod(config)
     
     setup_ssh_access(pod_id)
 
+# Prints EXISTS=0/1 and, if present, MTIME=<epoch> for the remote setup script
+_REMOTE_SETUP_PROBE = """\
+if [ -f /workspace/setup.sh ]; then
+    echo EXISTS=1
+    echo MTIME=$(stat -c %Y /workspace/setup.sh 2>/dev/null || stat -f %m /workspace/setup.sh)
+else
+    echo EXISTS=0
+fi
+"""
+
 def check_and_run_setup(config):
     """Check for setup script and run if present"""
     if not config.get('RUNPOD_VOLUME_ID'):
@@ -151,13 +827,20 @@ def check_and_run_setup(config):
     
     print("\nChecking for setup script...")
     
-    # Check if script exists on remote
+    # Probe existence and mtime of the remote script in one round trip
     result = subprocess.run(
-        ['ssh', 'runpod', 'test -f /workspace/setup.sh'],
-        capture_output=True
+        ['ssh', 'runpod', 'bash -s'],
+        input=_REMOTE_SETUP_PROBE,
+        capture_output=True,
+        text=True
     )
+    probe = {}
+    for line in result.stdout.splitlines():
+        key, sep, value = line.partition('=')
+        if sep:
+            probe[key] = value
     
-    if result.returncode != 0:
+    if probe.get('EXISTS') != '1':
         print(f"Setup script not found on remote pod")
         print(f"Run: {PROGRAM_NAME} install {setup_script}")
         return
@@ -165,25 +848,17 @@ def check_and_run_setup(config):
     # Check if local script is newer
     if os.path.exists(setup_script):
         local_mtime = os.path.getmtime(setup_script)
-        remote_result = subprocess.run(
-            ['ssh', 'runpod', 'stat -c %Y /workspace/setup.sh 2>/dev/null || stat -f %m /workspace/setup.sh'],
-            capture_output=True,
-            text=True,
-            shell=True
-        )
-        
-        if remote_result.returncode == 0:
-            try:
-                remote_mtime = int(remote_result.stdout.strip())
-                if local_mtime > remote_mtime:
-                    print(f"Local setup script is newer")
-                    update = input(f"Update remote script? (y/N): ").strip().lower()
-                    if update == 'y':
-                        subprocess.run(['scp', setup_script, 'runpod:/workspace/setup.sh'])
-                        subprocess.run(['ssh', 'runpod', 'chmod +x /workspace/setup.sh'])
-                        print("Setup script updated")
-            except ValueError:
-                pass
+        try:
+            remote_mtime = int(probe.get('MTIME', ''))
+            if local_mtime > remote_mtime:
+                print(f"Local setup script is newer")
+                update = input(f"Update remote script? (y/N): ").strip().lower()
+                if update == 'y':
+                    subprocess.run(['scp', setup_script, 'runpod:/workspace/setup.sh'])
+                    subprocess.run(['ssh', 'runpod', 'chmod +x /workspace/setup.sh'])
+                    print("Setup script updated")
+        except ValueError:
+            pass
     
     print("Running setup script...")
     result = subprocess.run(['ssh', 'runpod', 'bash /workspace/setup.sh'])
@@ -193,32 +868,40 @@ def check_and_run_setup(config):
     else:
         print("Setup script encountered errors")
 
+# Settings cmd_up reads, resolved once from config and command-line overrides
+_UpConfig = namedtuple('_UpConfig', 'gpu image volume auto_ssh')
+
 def cmd_up(args):
     """Start a GPU pod"""
     config = load_config()
-    runpod.api_key = config['RUNPOD_API_KEY']
+    runpod = _init_runpod(config)
     
     # Use --gpu override if provided, otherwise use config
-    gpu_type = args.gpu if args.gpu else config['RUNPOD_GPU_TYPE']
+    up = _UpConfig(
+        gpu=args.gpu if args.gpu else config['RUNPOD_GPU_TYPE'],
+        image=config['RUNPOD_DOCKER_IMAGE'],
+        volume=config.get('RUNPOD_VOLUME_ID'),
+        auto_ssh=config.get('RUNPOD_AUTO_SSH', 'true').lower() == 'true',
+    )
     
     print("Starting RunPod instance...")
-    print(f"  GPU: {gpu_type}")
-    print(f"  Image: {config['RUNPOD_DOCKER_IMAGE']}")
-    if config.get('RUNPOD_VOLUME_ID'):
-        print(f"  Volume: {config['RUNPOD_VOLUME_ID']}")
+    print(f"  GPU: {up.gpu}")
+    print(f"  Image: {up.image}")
+    if up.volume:
+        print(f"  Volume: {up.volume}")
     print()
     
     try:
         pod_args = {
             'name': "gpu-workspace",
-            'image_name': config['RUNPOD_DOCKER_IMAGE'],
-            'gpu_type_id': gpu_type,
+            'image_name': up.image,
+            'gpu_type_id': up.gpu,
             'container_disk_in_gb': 20,
             'ports': "8888/http,22/tcp"
         }
         
-        if config.get('RUNPOD_VOLUME_ID'):
-            pod_args['network_volume_id'] = config['RUNPOD_VOLUME_ID']
+        if up.volume:
+            pod_args['network_volume_id'] = up.volume
             pod_args['volume_mount_path'] = '/workspace'
         
         pod = runpod.create_pod(**pod_args)
@@ -227,43 +910,36 @@ def cmd_up(args):
         print(f"Pod ID: {pod['id']}")
         
         # Save pod ID
-        with open(CONFIG_FILE, 'a') as f:
-            f.write(f'\nRUNPOD_POD_ID="{pod["id"]}"\n')
+        _save_pod_id(pod['id'])
         
         # Wait for pod to start with progress bar
         pod_id = pod['id']
         max_wait = 300
-        check_interval = 2
-        elapsed = 0
-        bar_width = 40
         
-        while elapsed < max_wait:
-            time.sleep(check_interval)
-            elapsed += check_interval
-            
-            pod_status = runpod.get_pod(pod_id)
-            if pod_status and pod_status.get('runtime'):
-                print(f"\r{'=' * bar_width} Ready!          ")
-                break
-            
-            progress = elapsed / max_wait
-            filled = int(bar_width * progress)
-            bar = '=' * filled + '-' * (bar_width - filled)
-            remaining = int(max_wait - elapsed)
-            print(f"\rStarting pod [{bar}] {remaining}s ", end='', flush=True)
+        def pod_ready():
+            pod_status = _get_pod_cached(pod_id, config['RUNPOD_API_KEY'])
+            return pod_status if pod_status and pod_status.get('runtime') else None
+        
+        wait_start = time.monotonic()
+        pod_status = poll_with_progress(
+            "Starting pod", pod_ready, max_wait,
+            delays=adaptive_delays(ready_time_samples(config), **poll_settings(config))
+        )
+        
+        if pod_status:
+            print(f"\r{_FULL_BAR} Ready!          ")
+            record_ready_time(config, time.monotonic() - wait_start)
         else:
-            print(f"\r{'=' * bar_width} Timeout         ")
+            print(f"\r{_FULL_BAR} Timeout         ")
             print("Pod may still be starting")
             return
         
-        auto_ssh = config.get('RUNPOD_AUTO_SSH', 'true').lower() == 'true'
-        
         if args.no_ssh:
             print(f"\nSSH setup skipped (--no-ssh flag)")
             print(f"Run '{PROGRAM_NAME} ssh' to configure SSH access")
-        elif auto_ssh:
+        elif up.auto_ssh:
             print("\nConfiguring SSH access...")
-            if setup_ssh_access(pod_id):
+            if setup_ssh_access(pod_id, pod=pod_status):
                 time.sleep(2)
                 check_and_run_setup(config)
         else:
@@ -273,43 +949,47 @@ def cmd_up(args):
         print(f"Error: {e}")
         sys.exit(1)
 
+def format_pod(pod, current_pod_id=None):
+    """One pod's block for 'status --all', without a trailing newline"""
+    lines = [
+        f"ID: {pod['id']}",
+        f"  Name: {pod['name']}",
+        f"  Status: {'Running' if pod.get('runtime') else 'Stopped'}",
+        f"  GPU: {pod.get('machine', {}).get('gpuDisplayName', 'Unknown')}",
+        f"  Image: {pod['imageName']}",
+    ]
+    
+    runtime = pod.get('runtime')
+    if runtime:
+        for port in runtime.get('ports', []):
+            if port.get('privatePort') == 22:
+                lines.append(f"  SSH: ssh root@{port['ip']} -p {port['publicPort']}")
+                break
+    
+    if pod['id'] == current_pod_id:
+        lines.append("  [CURRENT]")
+    
+    return "\n".join(lines)
+
 def cmd_status(args):
     """Check pod status"""
     config = load_config()
-    runpod.api_key = config['RUNPOD_API_KEY']
+    _init_runpod(config)
+    
+    current_pod_id = _load_pod_id(config)
     
     # If --all flag, list all pods
     if args.all:
         try:
-            pods = runpod.get_pods()
+            pods = _get_pods_cached()
             
             if not pods:
                 print("No pods found")
                 sys.exit(0)
             
-            print(f"Found {len(pods)} pod(s):\n")
-            
-            for pod in pods:
-                status = "Running" if pod.get('runtime') else "Stopped"
-                print(f"ID: {pod['id']}")
-                print(f"  Name: {pod['name']}")
-                print(f"  Status: {status}")
-                print(f"  GPU: {pod.get('machine', {}).get('gpuDisplayName', 'Unknown')}")
-                print(f"  Image: {pod['imageName']}")
-                
-                runtime = pod.get('runtime')
-                if runtime:
-                    ports = runtime.get('ports', [])
-                    for port in ports:
-                        if port.get('privatePort') == 22:
-                            print(f"  SSH: ssh root@{port['ip']} -p {port['publicPort']}")
-                            break
-                
-                # Mark current pod
-                if pod['id'] == config.get('RUNPOD_POD_ID'):
-                    print("  [CURRENT]")
-                
-                print()
+            # Print all pods
+            blocks = "".join(f"{format_pod(pod, current_pod_id)}\n\n" for pod in pods)
+            sys.stdout.write(f"Found {len(pods)} pod(s):\n\n{blocks}")
             
             sys.exit(0)
             
@@ -318,15 +998,16 @@ def cmd_status(args):
             sys.exit(1)
     
     # Otherwise show current pod
-    if 'RUNPOD_POD_ID' not in config:
+    if not current_pod_id:
         print("No active pod found")
         print(f"Use '{PROGRAM_NAME} status --all' to see all pods")
         sys.exit(0)
     
-    pod_id = config['RUNPOD_POD_ID']
+    pod_id = current_pod_id
     
     try:
-        pod = runpod.get_pod(pod_id)
+        # Find the current pod in the pod list
+        pod = next((p for p in _get_pods_cached() if p['id'] == pod_id), None)
         
         if not pod:
             print(f"Pod {pod_id} not found")
@@ -352,22 +1033,55 @@ def cmd_status(args):
         print(f"Error: {e}")
         sys.exit(1)
 
+def wait_for_termination(pod_id, config):
+    """Poll until a terminated pod disappears, showing a progress bar"""
+    max_wait = 30
+    
+    # Termination usually finishes within seconds, so back off less far
+    settings = poll_settings(config)
+    settings['t_max'] = min(settings['t_max'], TERMINATE_POLL_MAX)
+    
+    gone = poll_with_progress(
+        "Verifying", lambda: not _get_pod_cached(pod_id, config['RUNPOD_API_KEY']), max_wait,
+        **settings
+    )
+    
+    if gone:
+        print(f"\r{_FULL_BAR} Confirmed!     ")
+    else:
+        print(f"\r{_FULL_BAR} Timeout         ")
+        print("Pod may still be terminating")
+
+def _close_ssh_master():
+    """Stop the 'ssh runpod' ControlMaster, if one is running
+    
+    A master outlives its pod for up to ControlPersist; if the next pod gets
+    the same ip:port, ssh would attach to the dead connection.
+    """
+    try:
+        subprocess.run(
+            ['ssh', '-O', 'exit', 'runpod'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
 def cmd_down(args):
     """Stop/terminate pod"""
     config = load_config()
-    runpod.api_key = config['RUNPOD_API_KEY']
+    runpod = _init_runpod(config)
     
     # If pod ID/name provided as argument
     if args.args:
         target = args.args[0]
         
         try:
-            # First try as direct pod ID
-            pod = runpod.get_pod(target)
+            # Resolve as exact pod ID, then by name or ID prefix, from one listing
+            pods = _get_pods_cached()
+            pod = {p['id']: p for p in pods}.get(target)
             
-            # If not found, search by name
             if not pod:
-                pods = runpod.get_pods()
                 matching_pods = [p for p in pods if p['name'] == target or p['id'].startswith(target)]
                 
                 if not matching_pods:
@@ -388,38 +1102,12 @@ def cmd_down(args):
             runpod.terminate_pod(pod_id)
             
             # Verify termination with progress bar
-            max_wait = 30
-            check_interval = 0.5
-            elapsed = 0
-            bar_width = 40
-            
-            while elapsed < max_wait:
-                time.sleep(check_interval)
-                elapsed += check_interval
-                
-                pod_status = runpod.get_pod(pod_id)
-                if not pod_status:
-                    print(f"\r{'=' * bar_width} Confirmed!     ")
-                    break
-                
-                progress = elapsed / max_wait
-                filled = int(bar_width * progress)
-                bar = '=' * filled + '-' * (bar_width - filled)
-                remaining = int(max_wait - elapsed)
-                print(f"\rVerifying [{bar}] {remaining}s ", end='', flush=True)
-            else:
-                print(f"\r{'=' * bar_width} Timeout         ")
-                print("Pod may still be terminating")
+            wait_for_termination(pod_id, config)
             
             # Remove from config if it was the current pod
-            if config.get('RUNPOD_POD_ID') == pod_id:
-                with open(CONFIG_FILE, 'r') as f:
-                    lines = f.readlines()
-                
-                with open(CONFIG_FILE, 'w') as f:
-                    for line in lines:
-                        if not line.startswith('RUNPOD_POD_ID='):
-                            f.write(line)
+            if _load_pod_id(config) == pod_id:
+                _close_ssh_master()
+                _clear_pod_id(config)
                 
                 print("\nPod ID removed from config")
             else:
@@ -432,52 +1120,27 @@ def cmd_down(args):
         return
     
     # Otherwise terminate current pod
-    if 'RUNPOD_POD_ID' not in config:
+    pod_id = _load_pod_id(config)
+    if not pod_id:
         print("No active pod found")
         print(f"Usage: {PROGRAM_NAME} down [pod_id_or_name]")
         sys.exit(0)
     
-    pod_id = config['RUNPOD_POD_ID']
-    
     try:
-        pod = runpod.get_pod(pod_id)
-        
-        if not pod:
+        print(f"Terminating pod {pod_id}...")
+        try:
+            runpod.terminate_pod(pod_id)
+        except runpod.error.QueryError:
+            # Only look the pod up when terminate fails, so an unrelated
+            # API error can't make us forget a pod that is still billed
+            if runpod.get_pod(pod_id):
+                raise
             print(f"Pod {pod_id} not found (may already be terminated)")
         else:
-            print(f"Terminating pod {pod_id}...")
-            runpod.terminate_pod(pod_id)
-            
-            max_wait = 30
-            check_interval = 0.5
-            elapsed = 0
-            bar_width = 40
-            
-            while elapsed < max_wait:
-                time.sleep(check_interval)
-                elapsed += check_interval
-                
-                pod_status = runpod.get_pod(pod_id)
-                if not pod_status:
-                    print(f"\r{'=' * bar_width} Confirmed!     ")
-                    break
-                
-                progress = elapsed / max_wait
-                filled = int(bar_width * progress)
-                bar = '=' * filled + '-' * (bar_width - filled)
-                remaining = int(max_wait - elapsed)
-                print(f"\rVerifying [{bar}] {remaining}s ", end='', flush=True)
-            else:
-                print(f"\r{'=' * bar_width} Timeout         ")
-                print("Pod may still be terminating")
-        
-        with open(CONFIG_FILE, 'r') as f:
-            lines = f.readlines()
+            wait_for_termination(pod_id, config)
         
-        with open(CONFIG_FILE, 'w') as f:
-            for line in lines:
-                if not line.startswith('RUNPOD_POD_ID='):
-                    f.write(line)
+        _close_ssh_master()
+        _clear_pod_id(config)
         
         print("\nPod ID removed from config")
         
@@ -488,24 +1151,14 @@ def cmd_down(args):
 def cmd_gpus():
     """List available GPUs"""
     config = load_config()
-    runpod.api_key = config['RUNPOD_API_KEY']
     
     try:
-        import requests
-        
         print("Fetching GPU types...\n")
         
-        response = requests.post(
-            'https://api.runpod.io/graphql',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {config["RUNPOD_API_KEY"]}'
-            },
-            json={'query': 'query { gpuTypes { id displayName memoryInGb lowestPrice { uninterruptablePrice } secureCloud communityCloud } }'}
-        )
-        
-        gpu_data = response.json()
-        gpus = gpu_data['data']['gpuTypes']
+        gpus = _graphql(
+            'query { gpuTypes { id memoryInGb lowestPrice { uninterruptablePrice } secureCloud communityCloud } }',
+            config['RUNPOD_API_KEY']
+        )['gpuTypes']
         
         # Filter to NVIDIA GPUs
         nvidia_gpus = [g for g in gpus if 'NVIDIA' in g['id']]
@@ -570,17 +1223,6 @@ def cmd_gpus():
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
-    """Configure SSH access"""
-    config = load_config()
-    
-    if 'RUNPOD_POD_ID' not in config:
-        print(f"No active pod found. Run '{PROGRAM_NAME} up' first")
-        sys.exit(1)
-    
-    runpod.api_key = config['RUNPOD_API_KEY']
-    pod_id = config['RUNPOD_POD_ID']
-    
-    setup_ssh_access(pod_id)
 
 def cmd_install(args):
     """Install local setup script to remote pod"""
@@ -590,7 +1232,7 @@ def cmd_install(args):
     
     config = load_config()
     
-    if 'RUNPOD_POD_ID' not in config:
+    if not _load_pod_id(config):
         print(f"No active pod found. Run '{PROGRAM_NAME} up' first")
         sys.exit(1)
     
@@ -626,8 +1268,6 @@ def cmd_install(args):
 
 def cmd_setup():
     """Run setup.py configuration"""
-    import requests
-    
     print(f"{PROGRAM_NAME} v{VERSION}")
     print("RunPod CLI Setup\n")
     
@@ -635,11 +1275,7 @@ def cmd_setup():
     config = {}
     if os.path.exists(CONFIG_FILE):
         print(f"Found existing configuration at {CONFIG_FILE}")
-        with open(CONFIG_FILE) as f:
-            for line in f:
-                if '=' in line and not line.startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    config[key] = value.strip('"')
+        config = _load_config_cached()
         
         print("\nCurrent settings:")
         print("  API Key: (hidden)")
@@ -667,16 +1303,8 @@ def cmd_setup():
     # Fetch GPU list
     print("\nFetching available GPU types...")
     try:
-        response = requests.post(
-            'https://api.runpod.io/graphql',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {api_key}'
-            },
-            json={'query': 'query { gpuTypes { id displayName } }'}
-        )
-        gpu_data = response.json()
-        gpu_list = [g['id'] for g in gpu_data['data']['gpuTypes'] if 'NVIDIA' in g['id']]
+        gpu_types = _graphql('query { gpuTypes { id } }', api_key)['gpuTypes']
+        gpu_list = [g['id'] for g in gpu_types if 'NVIDIA' in g['id']]
         
         if not gpu_list:
             print("Error: Failed to fetch GPU list. Check your API key.")
@@ -772,16 +1400,16 @@ def cmd_setup():
     else:
         setup_script = input("Enter path to setup script (leave blank to skip): ").strip()
     
-    # Save configuration
-    with open(CONFIG_FILE, 'w') as f:
-        f.write(f'RUNPOD_API_KEY="{api_key}"\n')
-        f.write(f'RUNPOD_VOLUME_ID="{volume_id}"\n')
-        f.write(f'RUNPOD_GPU_TYPE="{gpu_type}"\n')
-        f.write(f'RUNPOD_DOCKER_IMAGE="{docker_image}"\n')
-        f.write(f'RUNPOD_SETUP_SCRIPT="{setup_script}"\n')
-        f.write(f'RUNPOD_AUTO_SSH="true"\n')
-    
-    os.chmod(CONFIG_FILE, 0o600)
+    # Save configuration, keeping settings this wizard doesn't ask about
+    config.update({
+        'RUNPOD_API_KEY': api_key,
+        'RUNPOD_VOLUME_ID': volume_id,
+        'RUNPOD_GPU_TYPE': gpu_type,
+        'RUNPOD_DOCKER_IMAGE': docker_image,
+        'RUNPOD_SETUP_SCRIPT': setup_script,
+        'RUNPOD_AUTO_SSH': "true",
+    })
+    write_config(config)
     
     print(f"\nConfiguration saved to {CONFIG_FILE}")
     print("\nFinal configuration:")
@@ -817,38 +1445,61 @@ def usage():
     print(f"  {PROGRAM_NAME} down my-pod-name")
     print()
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="RunPod GPU management tool", add_help=False)
-    parser.add_argument('command', nargs='?', help='Command to run')
-    parser.add_argument('args', nargs='*', help='Additional arguments')
-    parser.add_argument('--no-ssh', action='store_true', help="Don't auto-configure SSH")
-    parser.add_argument('--all', action='store_true', help="Show all pods (for status command)")
-    parser.add_argument('--gpu', type=str, help="Override configured GPU type (for up command)")
+def build_parser():
+    """Argument parser with one subcommand per entry in _CMDS"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog=PROGRAM_NAME, description="RunPod GPU management tool", add_help=False)
+    commands = parser.add_subparsers(dest='command')
     
-    args = parser.parse_args()
+    commands.add_parser('setup', add_help=False)
     
-    if not args.command:
+    up = commands.add_parser('up', add_help=False)
+    up.add_argument('--no-ssh', action='store_true', help="Don't auto-configure SSH")
+    up.add_argument('--gpu', type=str, help="Override configured GPU type")
+    
+    status = commands.add_parser('status', add_help=False)
+    status.add_argument('--all', action='store_true', help="Show all pods")
+    
+    down = commands.add_parser('down', add_help=False)
+    down.add_argument('args', nargs='*', help='Pod ID or name')
+    
+    commands.add_parser('ssh', add_help=False)
+    
+    install = commands.add_parser('install', add_help=False)
+    install.add_argument('args', nargs='*', help='Local setup script path')
+    
+    commands.add_parser('gpus', add_help=False)
+    
+    return parser
+
+_CMDS = {
+    'setup': lambda args: cmd_setup(),
+    'up': cmd_up,
+    'status': cmd_status,
+    'down': cmd_down,
+    'ssh': lambda args: cmd_ssh(),
+    'install': cmd_install,
+    'gpus': lambda args: cmd_gpus(),
+}
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    
+    # usage and unknown commands are answered without importing argparse
+    if not argv:
         usage()
         sys.exit(1)
     
-    command = args.command
-    
-    if command == "setup":
-        cmd_setup()
-    elif command == "up":
-        cmd_up(args)
-    elif command == "status":
-        cmd_status(args)
-    elif command == "down":
-        cmd_down(args)
-    elif command == "ssh":
-        cmd_ssh()
-    elif command == "install":
-        cmd_install(args)
-    elif command == "gpus":
-        cmd_gpus()
-    else:
-        print(f"Unknown command: {command}")
+    if argv[0] in ('-h', '--help'):
+        usage()
+        sys.exit(0)
+    
+    handler = _CMDS.get(argv[0])
+    if handler is None:
+        print(f"Unknown command: {argv[0]}")
         print()
         usage()
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+    
+    handler(build_parser().parse_args(argv))